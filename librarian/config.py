@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List, Optional
 
@@ -13,6 +14,20 @@ class AppSettings(BaseSettings):
     CHUNK_OVERLAP_PERCENT: float = 0.2 # As a percentage for easier understanding
     EMBEDDING_MODEL_INGEST: str = "text-embedding-3-large"
     EMBEDDING_MODEL_SEARCH: str = "text-embedding-3-large"
+    # Dual-read window while a re-embedding migration is running: chunks not yet tagged with
+    # EMBEDDING_MODEL_SEARCH are still searched with this model (and index, if dimensions differ)
+    EMBEDDING_MODEL_SEARCH_PREVIOUS: Optional[str] = None
+    VECTOR_INDEX_NAME: str = "vector_index"
+    VECTOR_INDEX_NAME_PREVIOUS: Optional[str] = None # Defaults to VECTOR_INDEX_NAME
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = 256 # Chunks embedded per OpenAI request during migration
+    # Near-duplicate chunk detection (MinHash/LSH). Changing NUM_PERM or LSH_BANDS invalidates stored signatures
+    DEDUP_ENABLED: bool = True
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.85 # Estimated Jaccard similarity of word shingles
+    DEDUP_SHINGLE_SIZE: int = 5 # Words per shingle
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_LSH_BANDS: int = 16 # Must divide DEDUP_NUM_PERM
+    DEDUP_BACKFILL_BATCH_SIZE: int = 500 # Chunks per bulk write when signing existing chunks
+    DEDUP_SEARCH_OVERFETCH_FACTOR: int = 3 # Searches fetch k * factor so collapsing duplicates still leaves k results
     AGENT_MODEL: str = "o4-mini" # Current model from agent.py
     DEFAULT_REQUEST_TIMEOUT: int = 30 # seconds, for external API calls
     MAX_TEXT_SEARCH_RESULTS: int = 5
@@ -29,6 +44,15 @@ class AppSettings(BaseSettings):
         extra='ignore'  # Ignore extra fields from .env if any
     )
 
+    @model_validator(mode="after")
+    def _check_lsh_bands(self) -> "AppSettings":
+        # lsh_band_keys would otherwise silently ignore the leftover permutations
+        if self.DEDUP_LSH_BANDS <= 0 or self.DEDUP_NUM_PERM % self.DEDUP_LSH_BANDS != 0:
+            raise ValueError(
+                f"DEDUP_LSH_BANDS ({self.DEDUP_LSH_BANDS}) must be a positive divisor of DEDUP_NUM_PERM ({self.DEDUP_NUM_PERM})"
+            )
+        return self
+
     @property
     def CHUNK_OVERLAP(self) -> int:
         return int(self.CHUNK_SIZE * self.CHUNK_OVERLAP_PERCENT)
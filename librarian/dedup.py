@@ -0,0 +1,268 @@
+# Near-duplicate detection for chunks using MinHash signatures and LSH banding
+
+import argparse
+import hashlib
+import logging
+import random
+import re
+from typing import Any, Dict, List, Optional, Set, Union
+
+import dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from .config import settings
+from librarian.schema import ToolErrorOutput
+
+dotenv.load_dotenv()
+
+logger = logging.getLogger("librarian.dedup")
+
+mongodb_retry_decorator = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=settings.DEFAULT_REQUEST_TIMEOUT // 2),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type((ConnectionFailure, OperationFailure))
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures are persisted on chunks, so the permutations must be identical across processes
+_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(settings.DEDUP_NUM_PERM)
+]
+
+
+def _shingles(text: str) -> Set[str]:
+    words = re.findall(r"\w+", text.lower())
+    size = settings.DEDUP_SHINGLE_SIZE
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str) -> Optional[List[int]]:
+    """Compute the MinHash signature of a chunk's word shingles, or None if it has no words."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+        for shingle in _shingles(text)
+    ]
+    if not hashes:
+        return None # Chunks without words (e.g. table rules) would otherwise all look identical
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_band_keys(signature: Optional[List[int]]) -> List[str]:
+    """Split a signature into LSH bands; chunks sharing any band key are duplicate candidates."""
+    if not signature:
+        return []
+    rows = len(signature) // settings.DEDUP_LSH_BANDS
+    keys = []
+    for band in range(settings.DEDUP_LSH_BANDS):
+        band_values = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(repr(band_values).encode("utf-8"), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def estimate_jaccard(signature_a: Optional[List[int]], signature_b: Optional[List[int]]) -> float:
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0 # Missing signatures, or ones computed with different settings, are not comparable
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+def find_near_duplicate(chunks_collection: Collection, signature: Optional[List[int]],
+                        band_keys: List[str]) -> Optional[Dict[str, Any]]:
+    """Return the most similar canonical chunk at or above DEDUP_SIMILARITY_THRESHOLD, if any.
+
+    Only chunks that carry an embedding are candidates, since a duplicate relies on its
+    canonical chunk to serve vector search hits.
+    """
+    if not signature or not band_keys:
+        return None
+    candidates = chunks_collection.find(
+        {"lsh_bands": {"$in": band_keys}, "embedding": {"$exists": True}},
+        {"_id": 1, "minhash": 1}
+    )
+    best: Optional[Dict[str, Any]] = None
+    best_similarity = settings.DEDUP_SIMILARITY_THRESHOLD
+    for candidate in candidates:
+        similarity = estimate_jaccard(signature, candidate.get("minhash"))
+        if similarity >= best_similarity:
+            best, best_similarity = candidate, similarity
+    return best
+
+
+def collapse_duplicates(results: List[Dict], limit: int) -> List[Dict]:
+    """Drop search results that reference, or are near-identical to, a higher-ranked result.
+
+    Uses the stored minhash when the search projected it and strips it from the returned results.
+    """
+    kept: List[Dict] = []
+    kept_ids: Set[Any] = set()
+    kept_signatures: List[List[int]] = []
+    for result in results:
+        stored_signature = result.pop("minhash", None)
+        canonical_id = result.get("duplicate_of") or result.get("_id")
+        if canonical_id in kept_ids:
+            continue
+        signature = stored_signature or minhash_signature(result.get("text") or "")
+        if signature and any(estimate_jaccard(signature, other) >= settings.DEDUP_SIMILARITY_THRESHOLD for other in kept_signatures):
+            continue
+        kept.append(result)
+        kept_ids.add(canonical_id)
+        if signature:
+            kept_signatures.append(signature)
+        if len(kept) >= limit:
+            break
+    if len(kept) < len(results):
+        logger.debug(f"collapse_duplicates reduced {len(results)} results to {len(kept)}")
+    return kept
+
+
+def delete_chunks(chunks_collection: Collection, chunk_filter: Dict[str, Any]) -> Dict[str, int]:
+    """Delete the chunks matching chunk_filter without orphaning near-duplicates that reference them.
+
+    For each deleted canonical chunk with surviving duplicates, the first duplicate is promoted: it
+    takes over the canonical embedding and gets its own signature, and the others are repointed to it.
+    """
+    promoted = 0
+    canonicals = chunks_collection.find(
+        {**chunk_filter, "duplicate_of": {"$exists": False}, "embedding": {"$exists": True}},
+        {"_id": 1, "embedding": 1, "embedding_model": 1, "embedding_dimensions": 1}
+    )
+    for canonical in canonicals:
+        survivors = {"duplicate_of": canonical["_id"], "$nor": [chunk_filter]}
+        heir = chunks_collection.find_one(survivors, {"_id": 1, "text": 1}, sort=[("_id", 1)])
+        if heir is None:
+            continue
+        signature = minhash_signature(heir.get("text") or "")
+        chunks_collection.update_one(
+            {"_id": heir["_id"]},
+            {
+                "$set": {
+                    "embedding": canonical["embedding"],
+                    "embedding_model": canonical.get("embedding_model"),
+                    "embedding_dimensions": canonical.get("embedding_dimensions", len(canonical["embedding"])),
+                    "minhash": signature,
+                    "lsh_bands": lsh_band_keys(signature)
+                },
+                "$unset": {"duplicate_of": ""}
+            }
+        )
+        chunks_collection.update_many(
+            {**survivors, "_id": {"$ne": heir["_id"]}},
+            {"$set": {"duplicate_of": heir["_id"]}}
+        )
+        promoted += 1
+    deleted = chunks_collection.delete_many(chunk_filter).deleted_count
+    logger.info(f"delete_chunks removed {deleted} chunks and promoted {promoted} near-duplicates")
+    return {"deleted": deleted, "promoted": promoted}
+
+
+def delete_document(source: str) -> Union[Dict[str, int], ToolErrorOutput]:
+    """Remove every chunk of a source document, promoting near-duplicates from other documents."""
+    logger.info(f"delete_document called with source='{source}'")
+    try:
+        @mongodb_retry_decorator
+        def _delete_with_retry():
+            mongo_client = MongoClient(settings.MONGODB_ATLAS_URI, serverSelectionTimeoutMS=settings.HEALTH_CHECK_MONGO_TIMEOUT_MS)
+            # Promotion and repointing are idempotent, so a retried pass is harmless
+            return delete_chunks(mongo_client[settings.MONGODB_DB_NAME].chunks, {"metadata.source": source})
+        return _delete_with_retry()
+    except (ConnectionFailure, OperationFailure) as e:
+        logger.error(f"MongoDB permanent failure in delete_document after retries for {source}: {e}", exc_info=True)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message=f"MongoDB unavailable while deleting {source} after retries.", details=str(e))
+    except PyMongoError as e:
+        logger.error(f"MongoDB general error in delete_document for {source}: {e}", exc_info=True)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message=f"A MongoDB error occurred while deleting {source}.", details=str(e))
+
+
+def backfill_signatures(batch_size: Optional[int] = None) -> Union[Dict[str, Any], ToolErrorOutput]:
+    """Compute minhash/lsh_bands for canonical chunks stored before dedup existed.
+
+    Without this, documents already in the collection are never matched by new ingests.
+    Chunks without words get an empty lsh_bands so they are not rescanned.
+    """
+    batch_size = batch_size or settings.DEDUP_BACKFILL_BATCH_SIZE
+    logger.info(f"backfill_signatures called with batch_size={batch_size}")
+
+    try:
+        @mongodb_retry_decorator
+        def _connect_mongo_db():
+            mongo_client = MongoClient(settings.MONGODB_ATLAS_URI, serverSelectionTimeoutMS=settings.HEALTH_CHECK_MONGO_TIMEOUT_MS)
+            return mongo_client[settings.MONGODB_DB_NAME]
+
+        db: Database = _connect_mongo_db()
+        chunks_collection: Collection = db.chunks
+
+        @mongodb_retry_decorator
+        def _ensure_lsh_index():
+            chunks_collection.create_index("lsh_bands")
+        _ensure_lsh_index()
+
+        query = {
+            "embedding": {"$exists": True},
+            "lsh_bands": {"$exists": False},
+            "duplicate_of": {"$exists": False}
+        }
+        backfilled = 0
+        operations: List[UpdateOne] = []
+
+        @mongodb_retry_decorator
+        def _write_batch(batch_operations: List[UpdateOne]):
+            chunks_collection.bulk_write(batch_operations, ordered=False)
+
+        cursor = chunks_collection.find(query, {"text": 1}).sort("_id", 1).batch_size(batch_size)
+        with cursor:
+            for doc in cursor:
+                signature = minhash_signature(doc.get("text") or "")
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {"minhash": signature, "lsh_bands": lsh_band_keys(signature)}}
+                ))
+                if len(operations) >= batch_size:
+                    _write_batch(operations)
+                    backfilled += len(operations)
+                    logger.info(f"backfill_signatures processed {backfilled} chunks so far")
+                    operations = []
+            if operations:
+                _write_batch(operations)
+                backfilled += len(operations)
+
+        logger.info(f"backfill_signatures finished: {backfilled} chunks signed")
+        return {"backfilled": backfilled}
+
+    except (ConnectionFailure, OperationFailure) as e:
+        logger.error(f"MongoDB permanent failure in backfill_signatures after retries: {e}", exc_info=True)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message="MongoDB unavailable during signature backfill after retries; rerun to resume.", details=str(e))
+    except PyMongoError as e:
+        logger.error(f"MongoDB general error in backfill_signatures: {e}", exc_info=True)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message="A MongoDB error occurred during signature backfill.", details=str(e))
+    except Exception as e:
+        logger.exception(f"Unexpected error in backfill_signatures: {e}")
+        return ToolErrorOutput(error_type="DEDUP_ERROR", message="An unexpected error occurred during signature backfill.", details=str(e))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate index maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="Compute MinHash signatures and LSH bands for existing chunks")
+    parser.add_argument("--delete", metavar="SOURCE", default=None, help="Delete a document's chunks, promoting near-duplicates that reference them")
+    parser.add_argument("--batch-size", type=int, default=None, help="Chunks per bulk write (default: DEDUP_BACKFILL_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backfill:
+        print(backfill_signatures(batch_size=args.batch_size))
+    elif args.delete:
+        print(delete_document(args.delete))
+    else:
+        parser.print_help()
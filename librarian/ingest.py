@@ -9,7 +9,7 @@ from pymongo import MongoClient, InsertOne
 from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
 import uuid
 from agents import function_tool
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 from tiktoken.core import Encoding
 from pymongo.database import Database
 from pymongo.collection import Collection
@@ -18,6 +18,7 @@ from openai.types.embedding import Embedding
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from librarian.io import read_document
+from librarian.dedup import minhash_signature, lsh_band_keys, find_near_duplicate
 from .config import settings
 from librarian.schema import ToolErrorOutput
 
@@ -40,6 +41,66 @@ mongodb_retry_decorator = retry(
     retry=retry_if_exception_type((ConnectionFailure, OperationFailure))
 )
 
+def _store_chunks(chunks_collection: Collection, path: str, chunks_text_list: List[str]) -> int:
+    """Embed and upsert each chunk, storing near-duplicates as references. Returns the number of near-duplicates."""
+    meta: Dict[str, Any] = {"source": path}
+    operations = [] # For potential batching later, but will do one-by-one with retry for now
+    duplicate_count: int = 0
+
+    if settings.DEDUP_ENABLED:
+        @mongodb_retry_decorator
+        def _ensure_lsh_index():
+            chunks_collection.create_index("lsh_bands")
+        _ensure_lsh_index()
+
+    for idx, chunk_text_item in enumerate(chunks_text_list):
+        chunk_id: str = str(uuid.uuid4())
+        chunk_fields: Dict[str, Any] = {"text": chunk_text_item, "metadata": {**meta, "chunk": idx}}
+
+        existing_chunk = None
+        if settings.DEDUP_ENABLED:
+            signature: Optional[List[int]] = minhash_signature(chunk_text_item)
+            band_keys: List[str] = lsh_band_keys(signature)
+
+            @mongodb_retry_decorator
+            def _find_near_duplicate():
+                return find_near_duplicate(chunks_collection, signature, band_keys)
+            existing_chunk = _find_near_duplicate()
+
+        if existing_chunk is not None:
+            # Store only a reference: no OpenAI call, no second vector. The canonical chunk serves vector
+            # hits, and librarian.dedup.delete_document promotes a duplicate if the canonical is removed
+            chunk_fields["duplicate_of"] = existing_chunk["_id"]
+            duplicate_count += 1
+        else:
+            @openai_retry_decorator
+            def _get_embedding_for_chunk():
+                response_embed: CreateEmbeddingResponse = client.embeddings.create(
+                    model=settings.EMBEDDING_MODEL_INGEST, input=chunk_text_item 
+                )
+                if not response_embed.data or not response_embed.data[0].embedding:
+                    raise ValueError("OpenAI embedding response for chunk is empty or invalid.")
+                return response_embed.data[0].embedding
+
+            embedding_vector: List[float] = _get_embedding_for_chunk()
+            chunk_fields.update({
+                "embedding": embedding_vector,
+                "embedding_model": settings.EMBEDDING_MODEL_INGEST,
+                "embedding_dimensions": len(embedding_vector)
+            })
+            if settings.DEDUP_ENABLED:
+                chunk_fields.update({"minhash": signature, "lsh_bands": band_keys})
+        
+        @mongodb_retry_decorator
+        def _upsert_chunk():
+            chunks_collection.update_one(
+                {"_id": chunk_id},
+                {"$set": chunk_fields},
+                upsert=True
+            )
+        _upsert_chunk()
+    return duplicate_count
+
 @function_tool
 def ingest_document(path: str) -> Union[str, ToolErrorOutput]:
     """Extract, chunk, embed, and upsert into MongoDB Atlas. Returns ToolErrorOutput on failure."""
@@ -80,32 +141,11 @@ def ingest_document(path: str) -> Union[str, ToolErrorOutput]:
         db: Database = _connect_mongo_db()
         chunks_collection: Collection = db.chunks
         
-        meta: Dict[str, Any] = {"source": path}
-        operations = [] # For potential batching later, but will do one-by-one with retry for now
-
-        for idx, chunk_text_item in enumerate(chunks_text_list):
-            @openai_retry_decorator
-            def _get_embedding_for_chunk():
-                response_embed: CreateEmbeddingResponse = client.embeddings.create(
-                    model=settings.EMBEDDING_MODEL_INGEST, input=chunk_text_item 
-                )
-                if not response_embed.data or not response_embed.data[0].embedding:
-                    raise ValueError("OpenAI embedding response for chunk is empty or invalid.")
-                return response_embed.data[0].embedding
-            
-            embedding_vector: List[float] = _get_embedding_for_chunk()
-            chunk_id: str = str(uuid.uuid4())
-            
-            @mongodb_retry_decorator
-            def _upsert_chunk():
-                chunks_collection.update_one(
-                    {"_id": chunk_id},
-                    {"$set": {"text": chunk_text_item, "embedding": embedding_vector, "metadata": {**meta, "chunk": idx}}},
-                    upsert=True
-                )
-            _upsert_chunk()
+        duplicate_count: int = _store_chunks(chunks_collection, path, chunks_text_list)
 
-        logger.info(f"ingest_document successfully ingested {len(chunks_text_list)} chunks from {path}")
+        logger.info(f"ingest_document successfully ingested {len(chunks_text_list)} chunks from {path} ({duplicate_count} near-duplicates)")
+        if duplicate_count:
+            return f"Ingested {len(chunks_text_list)} chunks from {path} ({duplicate_count} near-duplicate chunks reference existing embeddings)."
         return f"Ingested {len(chunks_text_list)} chunks from {path}."
     
     except (APIConnectionError, RateLimitError, APIStatusError, APITimeoutError) as e:
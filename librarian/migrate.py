@@ -0,0 +1,214 @@
+# Embedding migration: re-embeds stored chunks in place when the embedding model changes
+
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+import dotenv
+from openai import OpenAI, APIConnectionError, RateLimitError, APIStatusError, APITimeoutError
+from openai.types.create_embedding_response import CreateEmbeddingResponse
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from .config import settings
+from librarian.schema import ToolErrorOutput
+
+dotenv.load_dotenv()
+
+logger = logging.getLogger("librarian.migrate")
+
+client = OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.DEFAULT_REQUEST_TIMEOUT)
+
+openai_retry_decorator = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=settings.DEFAULT_REQUEST_TIMEOUT // 2),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type((APIConnectionError, RateLimitError, APIStatusError, APITimeoutError))
+)
+
+mongodb_retry_decorator = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=settings.DEFAULT_REQUEST_TIMEOUT // 2),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type((ConnectionFailure, OperationFailure))
+)
+
+MIGRATIONS_COLLECTION = "embedding_migrations"
+
+
+@openai_retry_decorator
+def _embed_batch(model: str, texts: List[str]) -> List[List[float]]:
+    response: CreateEmbeddingResponse = client.embeddings.create(model=model, input=texts)
+    if not response.data or len(response.data) != len(texts):
+        raise ValueError("OpenAI embedding response for batch is empty or incomplete.")
+    # The API may return items out of order; align them with the inputs by index
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _flush_batch(chunks_collection: Collection, migrations_collection: Collection,
+                 target_model: str, batch: List[Dict[str, Any]]) -> int:
+    """Embed one batch, write it back with a single bulk_write and touch the migration status."""
+    vectors = _embed_batch(target_model, [doc["text"] for doc in batch])
+    operations = [
+        UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {
+                "embedding": vector,
+                "embedding_model": target_model,
+                "embedding_dimensions": len(vector)
+            }}
+        )
+        for doc, vector in zip(batch, vectors)
+    ]
+
+    @mongodb_retry_decorator
+    def _write_batch():
+        # Updates are idempotent, so replaying a batch after a failed status write is harmless
+        chunks_collection.bulk_write(operations, ordered=False)
+        migrations_collection.update_one(
+            {"_id": target_model},
+            {"$set": {"dimensions": len(vectors[0]), "updated_at": datetime.now(timezone.utc)}}
+        )
+    _write_batch()
+    return len(batch)
+
+
+def _record_failure(migrations_collection: Optional[Collection], target_model: str, error: Exception) -> None:
+    """Mark the migration as failed so a crashed run is distinguishable from a live one."""
+    if migrations_collection is None:
+        return
+    try:
+        migrations_collection.update_one(
+            {"_id": target_model},
+            {"$set": {"status": "failed", "error": str(error), "updated_at": datetime.now(timezone.utc)}}
+        )
+    except PyMongoError as status_error:
+        logger.error(f"Could not record failed status for migration to '{target_model}': {status_error}")
+
+
+def migrate_embeddings(target_model: Optional[str] = None, batch_size: Optional[int] = None,
+                       restart: bool = False) -> Union[Dict[str, Any], ToolErrorOutput]:
+    """Re-embed the stored text of every chunk not yet tagged with target_model.
+
+    Chunks are streamed in _id order and written back in batches. Re-embedded
+    chunks are tagged with target_model and drop out of the query, so rerunning
+    an interrupted migration resumes where it stopped. The run's status is kept
+    in the embedding_migrations collection. Returns a summary dict, or
+    ToolErrorOutput on failure.
+    """
+    target_model = target_model or settings.EMBEDDING_MODEL_INGEST
+    batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+    logger.info(f"migrate_embeddings called with target_model='{target_model}' batch_size={batch_size} restart={restart}")
+
+    migrations_collection: Optional[Collection] = None
+    try:
+        @mongodb_retry_decorator
+        def _connect_mongo_db():
+            mongo_client = MongoClient(settings.MONGODB_ATLAS_URI, serverSelectionTimeoutMS=settings.HEALTH_CHECK_MONGO_TIMEOUT_MS)
+            return mongo_client[settings.MONGODB_DB_NAME]
+
+        db: Database = _connect_mongo_db()
+        chunks_collection: Collection = db.chunks
+        migrations_collection: Collection = db[MIGRATIONS_COLLECTION]
+
+        @mongodb_retry_decorator
+        def _ensure_model_index():
+            # Every run scans for chunks not yet tagged with the target model
+            chunks_collection.create_index("embedding_model")
+        _ensure_model_index()
+
+        @mongodb_retry_decorator
+        def _start_run() -> Optional[Dict[str, Any]]:
+            existing = migrations_collection.find_one({"_id": target_model})
+            # A finished run's status only describes that run; start afresh
+            if restart or (existing is not None and existing.get("status") == "completed"):
+                migrations_collection.delete_one({"_id": target_model})
+                existing = None
+            now = datetime.now(timezone.utc)
+            migrations_collection.update_one(
+                {"_id": target_model},
+                {
+                    "$setOnInsert": {"started_at": now},
+                    "$set": {"status": "running", "updated_at": now},
+                    "$unset": {"error": ""}
+                },
+                upsert=True
+            )
+            return existing
+
+        if _start_run() is not None:
+            logger.info(f"Resuming interrupted migration to '{target_model}'")
+
+        query: Dict[str, Any] = {
+            "embedding_model": {"$ne": target_model},
+            "text": {"$type": "string", "$ne": ""},
+            "duplicate_of": {"$exists": False} # Near-duplicates carry no vector; their canonical chunk serves vector hits
+        }
+
+        migrated = 0
+        batch: List[Dict[str, Any]] = []
+        cursor = chunks_collection.find(query, {"text": 1}).sort("_id", 1).batch_size(batch_size)
+        with cursor:
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    migrated += _flush_batch(chunks_collection, migrations_collection, target_model, batch)
+                    logger.info(f"migrate_embeddings re-embedded {migrated} chunks so far")
+                    batch = []
+            if batch:
+                migrated += _flush_batch(chunks_collection, migrations_collection, target_model, batch)
+
+        @mongodb_retry_decorator
+        def _complete_run() -> Dict[str, Any]:
+            # Counted from the chunks themselves, so replayed or interrupted batches cannot skew it
+            migrated_total = chunks_collection.count_documents({"embedding_model": target_model})
+            now = datetime.now(timezone.utc)
+            migrations_collection.update_one(
+                {"_id": target_model},
+                {"$set": {"status": "completed", "migrated": migrated_total, "completed_at": now, "updated_at": now}}
+            )
+            return migrations_collection.find_one({"_id": target_model})
+
+        final_status = _complete_run()
+        logger.info(f"migrate_embeddings finished: {migrated} chunks re-embedded with '{target_model}' in this run")
+        return {
+            "target_model": target_model,
+            "migrated_this_run": migrated,
+            "migrated_total": final_status.get("migrated"),
+            "dimensions": final_status.get("dimensions"),
+            "status": final_status.get("status")
+        }
+
+    except (APIConnectionError, RateLimitError, APIStatusError, APITimeoutError) as e:
+        logger.error(f"OpenAI API permanent error in migrate_embeddings after retries: {e}", exc_info=True)
+        _record_failure(migrations_collection, target_model, e)
+        return ToolErrorOutput(error_type="API_ERROR", message="OpenAI API error during embedding migration after retries; rerun to resume.", details=str(e))
+    except ValueError as e:
+        logger.error(f"ValueError (likely OpenAI response issue) in migrate_embeddings: {e}", exc_info=True)
+        _record_failure(migrations_collection, target_model, e)
+        return ToolErrorOutput(error_type="API_ERROR", message="Invalid response from OpenAI embedding API during migration; rerun to resume.", details=str(e))
+    except (ConnectionFailure, OperationFailure) as e:
+        logger.error(f"MongoDB permanent failure in migrate_embeddings after retries: {e}", exc_info=True)
+        _record_failure(migrations_collection, target_model, e)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message="MongoDB unavailable during embedding migration after retries; rerun to resume.", details=str(e))
+    except PyMongoError as e:
+        logger.error(f"MongoDB general error in migrate_embeddings: {e}", exc_info=True)
+        _record_failure(migrations_collection, target_model, e)
+        return ToolErrorOutput(error_type="DATABASE_ERROR", message="A MongoDB error occurred during embedding migration.", details=str(e))
+    except Exception as e:
+        logger.exception(f"Unexpected error in migrate_embeddings: {e}")
+        _record_failure(migrations_collection, target_model, e)
+        return ToolErrorOutput(error_type="MIGRATION_ERROR", message="An unexpected error occurred during embedding migration.", details=str(e))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed stored chunks with a new embedding model.")
+    parser.add_argument("--model", default=None, help="Target embedding model (default: EMBEDDING_MODEL_INGEST)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Chunks per embedding request (default: EMBEDDING_MIGRATION_BATCH_SIZE)")
+    parser.add_argument("--restart", action="store_true", help="Discard the recorded status of a previous run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(migrate_embeddings(target_model=args.model, batch_size=args.batch_size, restart=args.restart))
@@ -10,6 +10,7 @@ from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from .config import settings
 from librarian.schema import ToolErrorOutput
+from librarian.dedup import collapse_duplicates
 
 dotenv.load_dotenv()
 
@@ -17,6 +18,14 @@ logger = logging.getLogger("librarian.search") # Changed logger name
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.DEFAULT_REQUEST_TIMEOUT)
 
+# Rank offset for reciprocal-rank fusion of dual-read results; 60 is the conventional default
+RRF_K = 60
+
+# Stored signatures let collapse_duplicates skip recomputing MinHash for each result
+RESULT_PROJECTION = {"_id": 1, "text": 1, "metadata": 1, "duplicate_of": 1}
+if settings.DEDUP_ENABLED:
+    RESULT_PROJECTION["minhash"] = 1
+
 # Retry decorator for OpenAI calls
 openai_retry_decorator = retry(
     wait=wait_exponential(multiplier=1, min=1, max=settings.DEFAULT_REQUEST_TIMEOUT // 2),
@@ -35,6 +44,7 @@ mongodb_retry_decorator = retry(
 def text_search(query: str, max_results: Optional[int]) -> Union[List[Dict], ToolErrorOutput]:
     """Use MongoDB Atlas text search to find keyword matches. Returns ToolErrorOutput on failure."""
     effective_max_results = max_results if max_results is not None else settings.MAX_TEXT_SEARCH_RESULTS
+    fetch_limit = effective_max_results * settings.DEDUP_SEARCH_OVERFETCH_FACTOR if settings.DEDUP_ENABLED else effective_max_results
     logger.info(f"text_search called with query='{query}' max_results={effective_max_results}")
     
     @mongodb_retry_decorator
@@ -45,14 +55,16 @@ def text_search(query: str, max_results: Optional[int]) -> Union[List[Dict], Too
         db = client_db[settings.MONGODB_DB_NAME]
         pipeline = [
             {"$search": {"text": {"query": query, "path": "text"}}},
-            {"$limit": effective_max_results},
-            {"$project": {"_id": 1, "text": 1, "metadata": 1}}
+            {"$limit": fetch_limit},
+            {"$project": RESULT_PROJECTION}
         ]
         # Consider adding maxTimeMS to aggregate if long queries are an issue
         return list(db.chunks.aggregate(pipeline))
 
     try:
         results = _execute_text_search_with_retry()
+        if settings.DEDUP_ENABLED:
+            results = collapse_duplicates(results, effective_max_results)
         logger.info(f"text_search returned {len(results)} results")
         return results
     except (ConnectionFailure, OperationFailure) as e: # More specific catch after retry
@@ -65,49 +77,88 @@ def text_search(query: str, max_results: Optional[int]) -> Union[List[Dict], Too
         logger.exception(f"Unexpected error in text_search: {e}")
         return ToolErrorOutput(error_type="TEXT_SEARCH_ERROR", message="An unexpected error occurred during text search.", details=str(e))
 
+@openai_retry_decorator
+def _embed_query(model: str, query: str) -> List[float]:
+    response = client.embeddings.create(
+        model=model, input=query
+    )
+    if not response.data or not response.data[0].embedding:
+        raise ValueError("OpenAI embedding response is empty or invalid.")
+    return response.data[0].embedding
+
+@mongodb_retry_decorator
+def _vector_search(embedding_vector: List[float], index_name: str, limit: int, vector_filter: Optional[Dict] = None) -> List[Dict]:
+    from pymongo import MongoClient 
+    client_db = MongoClient(settings.MONGODB_ATLAS_URI, serverSelectionTimeoutMS=settings.HEALTH_CHECK_MONGO_TIMEOUT_MS)
+    db = client_db[settings.MONGODB_DB_NAME]
+    vector_search = {
+        "index": index_name, 
+        "queryVector": embedding_vector,
+        "path": "embedding", 
+        "numCandidates": max(100, limit), # This could be configurable
+        "limit": limit
+    }
+    if vector_filter:
+        vector_search["filter"] = vector_filter # Requires embedding_model as a filter field in the index
+    pipeline = [
+        {"$vectorSearch": vector_search},
+        {"$project": {**RESULT_PROJECTION, "score": {"$meta": "vectorSearchScore"}}}
+    ]
+    return list(db.chunks.aggregate(pipeline))
+
+def _fuse_by_rank(result_lists: List[List[Dict]]) -> List[Dict]:
+    """Reciprocal-rank fusion; each result's score is replaced by its fused score so it follows the returned order."""
+    fused: Dict = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(result["_id"], {"result": result, "rrf_score": 0.0})
+            entry["rrf_score"] += 1.0 / (RRF_K + rank)
+    ranked = sorted(fused.values(), key=lambda e: e["rrf_score"], reverse=True)
+    return [{**entry["result"], "score": entry["rrf_score"]} for entry in ranked]
+
+def _dual_read_search(query: str, limit: int) -> List[Dict]:
+    """Migration window: migrated chunks are searched with the new model, the rest with the previous one.
+    Scores from different models are not comparable, so the two lists are fused by rank."""
+    current_model = settings.EMBEDDING_MODEL_SEARCH
+    previous_model = settings.EMBEDDING_MODEL_SEARCH_PREVIOUS
+    current_results = _vector_search(
+        embedding_vector=_embed_query(current_model, query),
+        index_name=settings.VECTOR_INDEX_NAME,
+        limit=limit,
+        vector_filter={"embedding_model": {"$eq": current_model}}
+    )
+    previous_results = _vector_search(
+        embedding_vector=_embed_query(previous_model, query),
+        index_name=settings.VECTOR_INDEX_NAME_PREVIOUS or settings.VECTOR_INDEX_NAME,
+        limit=limit,
+        vector_filter={"embedding_model": {"$ne": current_model}}
+    )
+    return _fuse_by_rank([current_results, previous_results])
+
 @function_tool
 def semantic_search(query: str, k: Optional[int]) -> Union[List[Dict], ToolErrorOutput]:
     """Embed query & use Atlas vectorSearch to find top-k chunks. Returns ToolErrorOutput on failure."""
     effective_k = k if k is not None else settings.DEFAULT_SEMANTIC_SEARCH_K
+    fetch_limit = effective_k * settings.DEDUP_SEARCH_OVERFETCH_FACTOR if settings.DEDUP_ENABLED else effective_k
     logger.info(f"semantic_search called with query='{query}' k={effective_k}")
 
-    @openai_retry_decorator
-    def _get_embedding_with_retry():
-        response = client.embeddings.create(
-            model=settings.EMBEDDING_MODEL_SEARCH, input=query
-        )
-        if not response.data or not response.data[0].embedding:
-            raise ValueError("OpenAI embedding response is empty or invalid.")
-        return response.data[0].embedding
-    
-    @mongodb_retry_decorator
-    def _execute_vector_search_with_retry(embedding_vector):
-        from pymongo import MongoClient 
-        client_db = MongoClient(settings.MONGODB_ATLAS_URI, serverSelectionTimeoutMS=settings.HEALTH_CHECK_MONGO_TIMEOUT_MS)
-        db = client_db[settings.MONGODB_DB_NAME]
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "vector_index", 
-                    "queryVector": embedding_vector,
-                    "path": "embedding", 
-                    "numCandidates": 100, # This could be configurable
-                    "limit": effective_k
-                }
-            },
-            {"$project": {"_id": 1, "text": 1, "metadata": 1}}
-        ]
-        return list(db.chunks.aggregate(pipeline))
-
     try:
-        embedding = _get_embedding_with_retry()
-        results = _execute_vector_search_with_retry(embedding_vector=embedding)
+        previous_model = settings.EMBEDDING_MODEL_SEARCH_PREVIOUS
+        if previous_model and previous_model != settings.EMBEDDING_MODEL_SEARCH:
+            results = _dual_read_search(query, fetch_limit)
+        else:
+            embedding = _embed_query(settings.EMBEDDING_MODEL_SEARCH, query)
+            results = _vector_search(embedding_vector=embedding, index_name=settings.VECTOR_INDEX_NAME, limit=fetch_limit)
+        if settings.DEDUP_ENABLED:
+            results = collapse_duplicates(results, effective_k)
+        else:
+            results = results[:effective_k]
         logger.info(f"semantic_search returned {len(results)} results")
         return results
     except (APIConnectionError, RateLimitError, APIStatusError, APITimeoutError) as e: # Specific catch after retry
         logger.error(f"OpenAI API permanent error in semantic_search after retries: {e}", exc_info=True)
         return ToolErrorOutput(error_type="API_ERROR", message="OpenAI API error during query embedding after retries.", details=str(e))
-    except ValueError as e: # Catch specific ValueError from _get_embedding_with_retry
+    except ValueError as e: # Catch specific ValueError from _embed_query
         logger.error(f"ValueError (likely OpenAI response issue) in semantic_search: {e}", exc_info=True)
         return ToolErrorOutput(error_type="API_ERROR", message="Invalid response from OpenAI embedding API.", details=str(e))
     except (ConnectionFailure, OperationFailure) as e: # Specific catch after retry
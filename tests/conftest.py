@@ -1,7 +1,28 @@
 import os
+import dotenv
 import pytest
 from pymongo import MongoClient
 
+# Only used where a unit-test module asks for it; integration suites see the real environment untouched
+_PLACEHOLDER_ENV = {
+    "MONGODB_ATLAS_URI": "mongodb://localhost:27017",
+    "S3_BUCKET_NAME": "test-bucket",
+    "OPENAI_API_KEY": "test-key",
+}
+
+@pytest.fixture(scope="module")
+def placeholder_settings_env():
+    """
+    Fill in settings that librarian.config validates at import time, for unit tests that never reach a
+    real service. Values from the environment or .env win, and placeholders are removed afterwards.
+    """
+    dotenv.load_dotenv()
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in _PLACEHOLDER_ENV.items():
+            if key not in os.environ:
+                mp.setenv(key, value)
+        yield
+
 @pytest.fixture(scope="session", autouse=True)
 def cleanup_test_chunks():
     """
@@ -14,8 +35,9 @@ def cleanup_test_chunks():
     if not mongo_uri:
         print("[CLEANUP] Skipping MongoDB cleanup: MONGODB_ATLAS_URI not set.")
         return
+    from librarian.dedup import delete_chunks
     client = MongoClient(mongo_uri)
     db = client[db_name]
-    # Remove test chunks by source pattern
-    result = db.chunks.delete_many({"metadata.source": {"$regex": r"sample_docs/|sample\\.(pdf|docx|md)$"}})
-    print(f"[CLEANUP] Removed {result.deleted_count} test chunks from MongoDB.")
+    # Remove test chunks by source pattern, promoting any near-duplicates elsewhere that reference them
+    result = delete_chunks(db.chunks, {"metadata.source": {"$regex": r"sample_docs/|sample\\.(pdf|docx|md)$"}})
+    print(f"[CLEANUP] Removed {result['deleted']} test chunks from MongoDB ({result['promoted']} near-duplicates promoted).")
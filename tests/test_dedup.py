@@ -0,0 +1,208 @@
+import importlib
+from unittest.mock import MagicMock
+
+import pytest
+
+BASE_TEXT = (
+    "The caching layer stores rendered search results in Redis for fifteen minutes. "
+    "Entries are invalidated whenever a document is re-ingested, and cache keys include "
+    "the embedding model so that results from different models never mix. Misses fall "
+    "back to MongoDB Atlas, and the response is written back asynchronously to avoid "
+    "adding latency to the request path. Operators can flush the cache from the admin "
+    "console, which also records the reason for the flush in the audit log."
+)
+NEAR_DUPLICATE_TEXT = BASE_TEXT.replace("fifteen minutes", "fifteen minutes by default")
+UNRELATED_TEXT = (
+    "Quarterly planning starts with a review of last quarter's goals, followed by "
+    "workshops where each team proposes objectives and estimates the effort involved."
+)
+
+
+@pytest.fixture(scope="module")
+def dedup(placeholder_settings_env):
+    return importlib.import_module("librarian.dedup")
+
+
+def test_identical_text_is_a_duplicate(dedup):
+    assert dedup.estimate_jaccard(dedup.minhash_signature(BASE_TEXT), dedup.minhash_signature(BASE_TEXT)) == 1.0
+
+
+def test_near_identical_text_is_above_threshold_and_shares_a_band(dedup):
+    signature_a = dedup.minhash_signature(BASE_TEXT)
+    signature_b = dedup.minhash_signature(NEAR_DUPLICATE_TEXT)
+    assert dedup.estimate_jaccard(signature_a, signature_b) >= dedup.settings.DEDUP_SIMILARITY_THRESHOLD
+    assert set(dedup.lsh_band_keys(signature_a)) & set(dedup.lsh_band_keys(signature_b))
+
+
+def test_unrelated_text_is_below_threshold(dedup):
+    similarity = dedup.estimate_jaccard(dedup.minhash_signature(BASE_TEXT), dedup.minhash_signature(UNRELATED_TEXT))
+    assert similarity < dedup.settings.DEDUP_SIMILARITY_THRESHOLD
+
+
+def test_text_without_words_has_no_signature(dedup):
+    assert dedup.minhash_signature("") is None
+    assert dedup.minhash_signature("| --- | --- |") is None
+    assert dedup.lsh_band_keys(None) == []
+    assert dedup.estimate_jaccard(None, None) == 0.0
+
+
+def test_collapse_prefers_higher_ranked_result(dedup):
+    results = [
+        {"_id": "a", "text": BASE_TEXT},
+        {"_id": "b", "text": NEAR_DUPLICATE_TEXT},
+        {"_id": "c", "text": UNRELATED_TEXT},
+    ]
+    assert [r["_id"] for r in dedup.collapse_duplicates(results, 5)] == ["a", "c"]
+
+
+def test_collapse_drops_results_referencing_a_kept_canonical(dedup):
+    results = [
+        {"_id": "copy", "text": "short copy", "duplicate_of": "a"},
+        {"_id": "a", "text": "short original"},
+    ]
+    assert [r["_id"] for r in dedup.collapse_duplicates(results, 5)] == ["copy"]
+
+
+def test_collapse_honours_limit(dedup):
+    results = [
+        {"_id": "a", "text": BASE_TEXT},
+        {"_id": "c", "text": UNRELATED_TEXT},
+        {"_id": "d", "text": "A third, entirely separate note about onboarding checklists."},
+    ]
+    assert [r["_id"] for r in dedup.collapse_duplicates(results, 2)] == ["a", "c"]
+
+
+def test_collapse_uses_and_strips_stored_signature(dedup):
+    stored = dedup.minhash_signature(BASE_TEXT)
+    results = [
+        {"_id": "a", "text": "", "minhash": stored},
+        {"_id": "b", "text": BASE_TEXT},
+    ]
+    collapsed = dedup.collapse_duplicates(results, 5)
+    assert [r["_id"] for r in collapsed] == ["a"]
+    assert "minhash" not in collapsed[0]
+
+
+def test_collapse_keeps_distinct_results_without_words(dedup):
+    results = [{"_id": "a", "text": "| --- |"}, {"_id": "b", "text": "***"}]
+    assert [r["_id"] for r in dedup.collapse_duplicates(results, 5)] == ["a", "b"]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+def test_find_near_duplicate_picks_best_candidate_above_threshold(dedup):
+    signature = dedup.minhash_signature(BASE_TEXT)
+    chunks = MagicMock()
+    chunks.find.return_value = [
+        {"_id": "unrelated", "minhash": dedup.minhash_signature(UNRELATED_TEXT)},
+        {"_id": "near", "minhash": dedup.minhash_signature(NEAR_DUPLICATE_TEXT)},
+        {"_id": "exact", "minhash": signature},
+    ]
+
+    match = dedup.find_near_duplicate(chunks, signature, dedup.lsh_band_keys(signature))
+
+    assert match["_id"] == "exact"
+
+
+def test_find_near_duplicate_ignores_candidates_below_threshold(dedup):
+    signature = dedup.minhash_signature(BASE_TEXT)
+    chunks = MagicMock()
+    chunks.find.return_value = [{"_id": "unrelated", "minhash": dedup.minhash_signature(UNRELATED_TEXT)}]
+
+    assert dedup.find_near_duplicate(chunks, signature, dedup.lsh_band_keys(signature)) is None
+
+
+def test_find_near_duplicate_only_considers_canonicals_with_an_embedding(dedup):
+    signature = dedup.minhash_signature(BASE_TEXT)
+    chunks = MagicMock()
+    chunks.find.return_value = []
+
+    dedup.find_near_duplicate(chunks, signature, dedup.lsh_band_keys(signature))
+
+    query = chunks.find.call_args.args[0]
+    assert query["embedding"] == {"$exists": True}
+    assert query["lsh_bands"] == {"$in": dedup.lsh_band_keys(signature)}
+
+
+def test_find_near_duplicate_skips_lookup_without_band_keys(dedup):
+    chunks = MagicMock()
+
+    assert dedup.find_near_duplicate(chunks, None, []) is None
+    assert dedup.find_near_duplicate(chunks, dedup.minhash_signature(BASE_TEXT), []) is None
+    chunks.find.assert_not_called()
+
+
+def test_backfill_signs_chunks_and_marks_wordless_ones(dedup, monkeypatch):
+    chunks = MagicMock()
+    chunks.find.return_value = FakeCursor([{"_id": "a", "text": BASE_TEXT}, {"_id": "b", "text": "| --- |"}])
+    db = MagicMock()
+    db.chunks = chunks
+    mongo_client = MagicMock()
+    mongo_client.__getitem__.return_value = db
+    monkeypatch.setattr(dedup, "MongoClient", lambda *args, **kwargs: mongo_client)
+
+    assert dedup.backfill_signatures(batch_size=10) == {"backfilled": 2}
+
+    query = chunks.find.call_args.args[0]
+    assert query["lsh_bands"] == {"$exists": False}
+    assert query["duplicate_of"] == {"$exists": False}
+    signed, wordless = chunks.bulk_write.call_args.args[0]
+    assert signed._doc["$set"]["lsh_bands"] == dedup.lsh_band_keys(dedup.minhash_signature(BASE_TEXT))
+    # An empty lsh_bands array still exists, so the chunk is not picked up again
+    assert wordless._doc["$set"] == {"minhash": None, "lsh_bands": []}
+
+
+def test_delete_chunks_promotes_first_surviving_duplicate(dedup):
+    chunk_filter = {"metadata.source": "a.pdf"}
+    chunks = MagicMock()
+    chunks.find.return_value = [{"_id": "canon", "embedding": [0.1, 0.2], "embedding_model": "model-a", "embedding_dimensions": 2}]
+    chunks.find_one.return_value = {"_id": "dup-1", "text": BASE_TEXT}
+    chunks.delete_many.return_value.deleted_count = 3
+
+    assert dedup.delete_chunks(chunks, chunk_filter) == {"deleted": 3, "promoted": 1}
+
+    survivors_filter = chunks.find_one.call_args.args[0]
+    assert survivors_filter == {"duplicate_of": "canon", "$nor": [chunk_filter]}
+    heir_filter, heir_update = chunks.update_one.call_args.args
+    assert heir_filter == {"_id": "dup-1"}
+    assert heir_update["$set"]["embedding"] == [0.1, 0.2]
+    assert heir_update["$set"]["embedding_model"] == "model-a"
+    assert heir_update["$set"]["lsh_bands"] == dedup.lsh_band_keys(dedup.minhash_signature(BASE_TEXT))
+    assert heir_update["$unset"] == {"duplicate_of": ""}
+    repoint_filter, repoint_update = chunks.update_many.call_args.args
+    assert repoint_filter == {**survivors_filter, "_id": {"$ne": "dup-1"}}
+    assert repoint_update == {"$set": {"duplicate_of": "dup-1"}}
+    chunks.delete_many.assert_called_once_with(chunk_filter)
+
+
+def test_delete_chunks_without_duplicates_only_deletes(dedup):
+    chunks = MagicMock()
+    chunks.find.return_value = [{"_id": "canon", "embedding": [0.1]}]
+    chunks.find_one.return_value = None
+    chunks.delete_many.return_value.deleted_count = 1
+
+    assert dedup.delete_chunks(chunks, {"metadata.source": "a.pdf"}) == {"deleted": 1, "promoted": 0}
+    chunks.update_one.assert_not_called()
+
+
+def test_settings_reject_bands_that_do_not_divide_permutations(dedup):
+    with pytest.raises(ValueError):
+        dedup.settings.__class__(DEDUP_NUM_PERM=128, DEDUP_LSH_BANDS=20)
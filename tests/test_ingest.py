@@ -0,0 +1,58 @@
+import importlib
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+CHUNK_TEXT = (
+    "Deployment uses blue-green environments behind the load balancer. Traffic is shifted "
+    "in ten percent steps while error rates and latency are watched on the release dashboard, "
+    "and a rollback returns all traffic to the previous environment within a minute."
+)
+
+
+@pytest.fixture(scope="module")
+def ingest(placeholder_settings_env):
+    return importlib.import_module("librarian.ingest")
+
+
+@pytest.fixture
+def openai_client(ingest, monkeypatch):
+    fake_client = MagicMock()
+    fake_client.embeddings.create.return_value = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2, 0.3])])
+    monkeypatch.setattr(ingest, "client", fake_client)
+    return fake_client
+
+
+def _stored_fields(chunks):
+    return [call.args[1]["$set"] for call in chunks.update_one.call_args_list]
+
+
+def test_store_chunks_references_near_duplicate_without_embedding_call(ingest, openai_client):
+    signature = ingest.minhash_signature(CHUNK_TEXT)
+    chunks = MagicMock()
+    chunks.find.return_value = [{"_id": "canonical", "minhash": signature}]
+
+    assert ingest._store_chunks(chunks, "copy.docx", [CHUNK_TEXT]) == 1
+
+    openai_client.embeddings.create.assert_not_called()
+    (fields,) = _stored_fields(chunks)
+    assert fields["duplicate_of"] == "canonical"
+    assert fields["metadata"] == {"source": "copy.docx", "chunk": 0}
+    for absent in ("embedding", "embedding_model", "minhash", "lsh_bands"):
+        assert absent not in fields
+
+
+def test_store_chunks_embeds_and_signs_new_content(ingest, openai_client):
+    chunks = MagicMock()
+    chunks.find.return_value = []
+
+    assert ingest._store_chunks(chunks, "original.pdf", [CHUNK_TEXT]) == 0
+
+    openai_client.embeddings.create.assert_called_once()
+    (fields,) = _stored_fields(chunks)
+    assert "duplicate_of" not in fields
+    assert fields["embedding"] == [0.1, 0.2, 0.3]
+    assert fields["embedding_model"] == ingest.settings.EMBEDDING_MODEL_INGEST
+    assert fields["lsh_bands"] == ingest.lsh_band_keys(ingest.minhash_signature(CHUNK_TEXT))
+    chunks.create_index.assert_called_once_with("lsh_bands")
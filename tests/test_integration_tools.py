@@ -10,6 +10,8 @@ if "OPENAI_API_KEY" not in os.environ:
     raise EnvironmentError("OPENAI_API_KEY must be set in the environment for these tests to run.")
 
 from librarian.tools import text_search, semantic_search, read_document, ingest_document, health_check
+from librarian.dedup import minhash_signature, estimate_jaccard
+from librarian.config import settings
 
 MONGODB_ATLAS_URI = os.getenv("MONGODB_ATLAS_URI")
 S3_BUCKET = os.getenv("S3_BUCKET")
@@ -51,6 +53,28 @@ def test_ingest_document_local(filename):
     assert isinstance(result, str)
     assert "Ingested" in result
 
+def test_ingest_document_local_dedups_copies_in_search():
+    # Sample.pdf and Sample.docx are copies of the same document. The DOCX is ingested right after the
+    # PDF, so it reports near-duplicates whatever other tests stored before
+    results = []
+    for filename in ["Sample.pdf", "Sample.docx"]:
+        path = os.path.join(os.path.dirname(__file__), "sample_docs", filename)
+        result = ingest_document(path)
+        assert isinstance(result, str)
+        assert "Ingested" in result
+        results.append(result)
+    assert "near-duplicate chunks reference existing embeddings" in results[1]
+
+    for hits in (semantic_search("Building a High-Impact Multi-LLM Coding Agent", 5),
+                 text_search("Multi-LLM Coding Agent", 5)):
+        assert isinstance(hits, list)
+        canonical_ids = [hit.get("duplicate_of") or hit["_id"] for hit in hits]
+        assert len(canonical_ids) == len(set(canonical_ids))
+        signatures = [minhash_signature(hit["text"]) for hit in hits]
+        for i, signature in enumerate(signatures):
+            for other in signatures[i + 1:]:
+                assert estimate_jaccard(signature, other) < settings.DEDUP_SIMILARITY_THRESHOLD
+
 def test_read_document_unsupported_type_raises():
     path = os.path.join(os.path.dirname(__file__), "sample_docs", "unsupported.xyz")
     with open(path, "w") as f:
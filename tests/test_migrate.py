@@ -0,0 +1,165 @@
+import importlib
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+def _embedding_response(vectors, order=None):
+    order = order if order is not None else range(len(vectors))
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=vectors[i]) for i in order])
+
+
+@pytest.fixture(scope="module")
+def migrate(placeholder_settings_env):
+    return importlib.import_module("librarian.migrate")
+
+
+@pytest.fixture
+def openai_client(migrate, monkeypatch):
+    fake_client = MagicMock()
+    fake_client.embeddings.create.side_effect = lambda model, input: _embedding_response(
+        [[float(i), 0.5, 0.25] for i in range(len(input))]
+    )
+    monkeypatch.setattr(migrate, "client", fake_client)
+    return fake_client
+
+
+@pytest.fixture
+def collections(migrate, monkeypatch):
+    chunks = MagicMock()
+    migrations = MagicMock()
+    db = MagicMock()
+    db.chunks = chunks
+    db.__getitem__.return_value = migrations
+    mongo_client = MagicMock()
+    mongo_client.__getitem__.return_value = db
+    monkeypatch.setattr(migrate, "MongoClient", lambda *args, **kwargs: mongo_client)
+    return chunks, migrations
+
+
+def test_embed_batch_reorders_by_index(migrate, monkeypatch):
+    fake_client = MagicMock()
+    fake_client.embeddings.create.return_value = _embedding_response([[0.0], [1.0], [2.0]], order=[2, 0, 1])
+    monkeypatch.setattr(migrate, "client", fake_client)
+    assert migrate._embed_batch("model-b", ["a", "b", "c"]) == [[0.0], [1.0], [2.0]]
+
+
+def test_embed_batch_rejects_incomplete_response(migrate, monkeypatch):
+    fake_client = MagicMock()
+    fake_client.embeddings.create.return_value = _embedding_response([[0.0]])
+    monkeypatch.setattr(migrate, "client", fake_client)
+    with pytest.raises(ValueError):
+        migrate._embed_batch("model-b", ["a", "b"])
+
+
+def test_flush_batch_writes_tagged_embeddings_and_status(migrate, openai_client):
+    chunks, migrations = MagicMock(), MagicMock()
+    batch = [{"_id": "a", "text": "first"}, {"_id": "b", "text": "second"}]
+
+    assert migrate._flush_batch(chunks, migrations, "model-b", batch) == 2
+
+    operations = chunks.bulk_write.call_args.args[0]
+    assert [op._filter for op in operations] == [{"_id": "a"}, {"_id": "b"}]
+    assert operations[1]._doc["$set"] == {
+        "embedding": [1.0, 0.5, 0.25],
+        "embedding_model": "model-b",
+        "embedding_dimensions": 3
+    }
+    status_filter, status_update = migrations.update_one.call_args.args
+    assert status_filter == {"_id": "model-b"}
+    assert status_update["$set"]["dimensions"] == 3
+    assert "$inc" not in status_update
+
+
+def test_migrate_embeddings_batches_and_completes(migrate, openai_client, collections):
+    chunks, migrations = collections
+    docs = [{"_id": f"id-{i}", "text": f"chunk {i}"} for i in range(5)]
+    chunks.find.return_value = FakeCursor(docs)
+    chunks.count_documents.return_value = 7
+    migrations.find_one.side_effect = [None, {"migrated": 7, "dimensions": 3, "status": "completed"}]
+
+    result = migrate.migrate_embeddings(target_model="model-b", batch_size=2)
+
+    assert result["migrated_this_run"] == 5
+    assert result["migrated_total"] == 7
+    assert result["status"] == "completed"
+    assert chunks.bulk_write.call_count == 3
+    assert openai_client.embeddings.create.call_count == 3
+    chunks.create_index.assert_called_once_with("embedding_model")
+    chunks.count_documents.assert_called_once_with({"embedding_model": "model-b"})
+    completed_update = migrations.update_one.call_args.args[1]
+    assert completed_update["$set"]["status"] == "completed"
+    assert completed_update["$set"]["migrated"] == 7
+
+
+def test_migrate_embeddings_resume_relies_on_model_tag(migrate, openai_client, collections):
+    chunks, migrations = collections
+    chunks.find.return_value = FakeCursor([])
+    interrupted = {"status": "running"}
+    migrations.find_one.side_effect = [interrupted, {**interrupted, "status": "completed"}]
+
+    migrate.migrate_embeddings(target_model="model-b")
+
+    query = chunks.find.call_args.args[0]
+    assert query["embedding_model"] == {"$ne": "model-b"}
+    assert "_id" not in query
+    migrations.delete_one.assert_not_called()
+    start_update = migrations.update_one.call_args_list[0].args[1]
+    assert "last_id" not in start_update["$setOnInsert"]
+
+
+def test_migrate_embeddings_resets_completed_status(migrate, openai_client, collections):
+    chunks, migrations = collections
+    chunks.find.return_value = FakeCursor([])
+    completed = {"status": "completed", "migrated": 10}
+    migrations.find_one.side_effect = [completed, completed]
+
+    migrate.migrate_embeddings(target_model="model-a")
+
+    migrations.delete_one.assert_called_once_with({"_id": "model-a"})
+
+
+def test_migrate_embeddings_restart_discards_status(migrate, openai_client, collections):
+    chunks, migrations = collections
+    chunks.find.return_value = FakeCursor([])
+    running = {"status": "running"}
+    migrations.find_one.side_effect = [running, running]
+
+    migrate.migrate_embeddings(target_model="model-b", restart=True)
+
+    migrations.delete_one.assert_called_once_with({"_id": "model-b"})
+
+
+def test_migrate_embeddings_marks_status_failed(migrate, openai_client, collections):
+    chunks, migrations = collections
+    chunks.find.return_value = FakeCursor([{"_id": "a", "text": "first"}])
+    migrations.find_one.side_effect = [None]
+    openai_client.embeddings.create.side_effect = ValueError("bad response")
+
+    result = migrate.migrate_embeddings(target_model="model-b")
+
+    assert result.error_type == "API_ERROR"
+    failure_update = migrations.update_one.call_args.args[1]
+    assert failure_update["$set"]["status"] == "failed"
+    assert failure_update["$set"]["error"] == "bad response"
@@ -0,0 +1,57 @@
+import importlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def search(placeholder_settings_env):
+    return importlib.import_module("librarian.search")
+
+
+@pytest.fixture
+def dual_read(search, monkeypatch):
+    monkeypatch.setattr(search.settings, "EMBEDDING_MODEL_SEARCH", "model-new")
+    monkeypatch.setattr(search.settings, "EMBEDDING_MODEL_SEARCH_PREVIOUS", "model-old")
+    monkeypatch.setattr(search.settings, "VECTOR_INDEX_NAME", "vector_index_new")
+    monkeypatch.setattr(search.settings, "VECTOR_INDEX_NAME_PREVIOUS", "vector_index")
+    monkeypatch.setattr(search, "_embed_query", lambda model, query: [1.0] if model == "model-new" else [2.0])
+    calls = []
+
+    def fake_vector_search(embedding_vector, index_name, limit, vector_filter=None):
+        calls.append({"vector": embedding_vector, "index": index_name, "limit": limit, "filter": vector_filter})
+        if index_name == "vector_index_new":
+            # A model whose similarities cluster low
+            return [{"_id": "new-1", "score": 0.41}, {"_id": "new-2", "score": 0.40}]
+        # A model whose similarities cluster high, e.g. ada-002
+        return [{"_id": "old-1", "score": 0.89}, {"_id": "old-2", "score": 0.88}, {"_id": "old-3", "score": 0.87}]
+
+    monkeypatch.setattr(search, "_vector_search", fake_vector_search)
+    return calls
+
+
+def test_dual_read_routes_models_to_their_filters(search, dual_read):
+    search._dual_read_search("caching", 5)
+
+    current, previous = dual_read
+    assert current == {"vector": [1.0], "index": "vector_index_new", "limit": 5, "filter": {"embedding_model": {"$eq": "model-new"}}}
+    assert previous == {"vector": [2.0], "index": "vector_index", "limit": 5, "filter": {"embedding_model": {"$ne": "model-new"}}}
+
+
+def test_dual_read_interleaves_by_rank_not_score(search, dual_read):
+    results = search._dual_read_search("caching", 5)
+
+    assert [r["_id"] for r in results] == ["new-1", "old-1", "new-2", "old-2", "old-3"]
+
+
+def test_dual_read_scores_follow_returned_order(search, dual_read):
+    results = search._dual_read_search("caching", 5)
+
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == pytest.approx(1.0 / (search.RRF_K + 1))
+
+
+def test_fuse_by_rank_sums_contributions_for_shared_results(search):
+    fused = search._fuse_by_rank([[{"_id": "a"}, {"_id": "b"}], [{"_id": "b"}, {"_id": "c"}]])
+
+    assert [r["_id"] for r in fused] == ["b", "a", "c"]